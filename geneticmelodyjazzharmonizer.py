@@ -6,11 +6,137 @@ in Sound and Music Computing at Universitat Pompeu Fabra.
 authors: Sergio Cárdenas Gracia & Siddharth Saxena
 """
 
-import random
+import functools
+import multiprocessing
 import music21
+import numpy as np
 import metrics
 from dataclasses import dataclass
-
+from typing import Final
+
+
+# Define the melody
+TWINKLE_TWINKLE_MELODY: Final = (
+    ("C5", 1),
+    ("C5", 1),
+    ("G5", 1),
+    ("G5", 1),
+    ("A5", 1),
+    ("A5", 1),
+    ("G5", 2),  # Twinkle, twinkle, little star,
+    ("F5", 1),
+    ("F5", 1),
+    ("E5", 1),
+    ("E5", 1),
+    ("D5", 1),
+    ("D5", 1),
+    ("C5", 2),  # How I wonder what you are!
+    ("G5", 1),
+    ("G5", 1),
+    ("F5", 1),
+    ("F5", 1),
+    ("E5", 1),
+    ("E5", 1),
+    ("D5", 2),  # Up above the world so high,
+    ("G5", 1),
+    ("G5", 1),
+    ("F5", 1),
+    ("F5", 1),
+    ("E5", 1),
+    ("E5", 1),
+    ("D5", 2),  # Like a diamond in the sky.
+    ("C5", 1),
+    ("C5", 1),
+    ("G5", 1),
+    ("G5", 1),
+    ("A5", 1),
+    ("A5", 1),
+    ("G5", 2),  # Twinkle, twinkle, little star,
+    ("F5", 1),
+    ("F5", 1),
+    ("E5", 1),
+    ("E5", 1),
+    ("D5", 1),
+    ("D5", 1),
+    ("C5", 2),  # How I wonder what you are!
+)
+
+# Define weights for fitness evaluation
+WEIGHTS: Final = {
+    "ChordMelodyCongruence": 0.24,
+    "ChordVariety": 0.08,
+    "HarmonicFlow": 0.18,
+    "FunctionalHarmony": 0.10,
+    "VoiceLeading": 0.02,
+    "ChordRepetitions": 0.06,
+    "NonDiatonicChords": 0.06,
+    "FunctionalProgressions": 0.25,
+    "ParallelFifths": 0.01,
+}
+
+# Define set of chords and their note mappings for harmonization
+CHORD_MAPPINGS: Final = {
+    "Cmaj7": ("C", "E", "G", "B"),
+    "Dm7": ("D", "F", "A", "C"),
+    "Em7": ("E", "G", "B", "D"),
+    "Fmaj7": ("F", "A", "C", "E"),
+    "G7": ("G", "B", "D", "F"),
+    "Am7": ("A", "C", "E", "G"),
+    "Bm7b5": ("B", "D", "F", "A"),
+    "C7": ("C", "E", "G", "Bb"),
+    "D7": ("D", "F#", "A", "C"),
+    "E7": ("E", "G#", "B", "D"),
+    "A7": ("A", "C#", "E", "G"),
+    "Dm7b5": ("D", "F", "Ab", "C"),
+    "Eº7": ("E", "G", "Bb", "Db"),
+    "Gmin7": ("G", "Bb", "D", "F"),
+}
+
+# Define preferred transitions between chords
+PREFERRED_TRANSITIONS: Final = {
+    "Cmaj7": ("Em7", "Fmaj7", "Am7", "C7", "E7", "A7", "Eº7"),
+    "Dm7": ("G7", "Am7", "Bm7b5", "D7"),
+    "Em7": ("Am7", "A7", "Eº7", "Gmin7"),
+    "Fmaj7": ("Cmaj7", "Em7", "G7", "Bm7b5", "D7", "E7", "Dm7b5"),
+    "G7": ("Cmaj7", "Am7", "Em7"),
+    "Am7": ("Dm7", "Fmaj7", "Gmin7", "Dm7b5"),
+    "Bm7b5": ("Em7", "E7"),
+    "C7": ("Fmaj7",),
+    "D7": ("G7",),
+    "E7": ("Am7",),
+    "A7": ("Dm7",),
+    "Dm7b5": ("Cmaj7", "Em7"),
+    "Eº7": ("Dm7", "Fmaj7"),
+    "Gmin7": ("C7", "Eº7"),
+}
+
+# Define chord transitions with parallel fifths
+CHORDS_WITH_PARALLEL_FIFTHS: Final = frozenset({
+    frozenset(("Cmaj7", "Dm7")),
+    frozenset(("Cmaj7", "D7")),
+    frozenset(("Dm7", "Em7")),
+    frozenset(("Dm7", "E7")),
+    frozenset(("Em7", "D7")),
+    frozenset(("Am7", "Bm7b5")),
+    frozenset(("Bm7b5", "Cmaj7")),
+    frozenset(("Bm7b5", "C7")),
+    frozenset(("D7", "E7")),
+})
+
+# Define common functional chord progressions
+COMMON_PROGRESSIONS: Final = (
+    ("Dm7", "G7", "Cmaj7"),
+    ("Fmaj7", "Dm7b5", "Cmaj7"),
+    ("Em7", "A7", "Dm7"),
+    ("Cmaj7", "Eº7", "Dm7"),
+    ("Fmaj7", "Bm7b5", "Em7"),
+    ("Fmaj7", "Bm7b5", "E7"),
+    ("Gmin7", "C7", "Fmaj7"),
+    ("Am7", "D7", "G7"),
+    ("Am7", "Dm7", "G7"),
+    ("Bm7b5", "E7", "Am7"),
+    ("Bm7b5", "Em7", "Am7"),
+)
 
 
 @dataclass(frozen=True)
@@ -51,14 +177,26 @@ class GeneticMelodyHarmonizer:
     """
     Generates chord accompaniments for a given melody using a genetic algorithm.
     It evolves a population of chord sequences to find one that best fits the
-    melody based on a fitness function.
+    melody based on a fitness function. The population is evolved as an
+    `np.int8` matrix with one chord sequence per row, where each chord is
+    represented by its identifier, i.e. its index in the fitness evaluator's
+    chord mappings.
 
     Attributes:
         melody_data (MusicData): Data containing melody information.
-        chords (list): Available chords for generating sequences.
+        chords (list): Available chords for generating sequences, any subset
+            of the fitness evaluator's chord mappings.
         population_size (int): Size of the chord sequence population.
         mutation_rate (float): Probability of mutation in the genetic algorithm.
         fitness_evaluator (FitnessEvaluator): Instance used to assess fitness.
+        rng (np.random.Generator): Random generator shared by all the random
+            operations of the genetic algorithm.
+        n_workers (int): Number of worker processes evaluating the fitness.
+        selection (str): Parent selection method, "tournament" or "roulette".
+        elite_size (int): Number of fittest sequences kept in each generation.
+        patience (int): Generations without improvement before stopping.
+        tol (float): Minimum increase of the best fitness that counts as an
+            improvement.
     """
 
     def __init__(
@@ -68,6 +206,12 @@ class GeneticMelodyHarmonizer:
         population_size,
         mutation_rate,
         fitness_evaluator,
+        seed=None,
+        n_workers=1,
+        selection="tournament",
+        elite_size=2,
+        patience=50,
+        tol=1e-6,
     ):
         """
         Initializes the generator with melody data, chords, population size,
@@ -79,78 +223,218 @@ class GeneticMelodyHarmonizer:
             population_size (int): Size of population in the algorithm.
             mutation_rate (float): Mutation probability per chord.
             fitness_evaluator (FitnessEvaluator): Evaluator for chord fitness.
+            seed (int): Seed of the random generator, for reproducibility. Runs
+                with the same seed and parameters generate the same chords.
+            n_workers (int): Number of worker processes among which the fitness
+                evaluation of each generation is split. With a single worker,
+                the fitness is evaluated in the current process.
+            selection (str): Parent selection method. "tournament" picks the
+                fitter of two random sequences for each parent, while
+                "roulette" picks parents with probability proportional to
+                their fitness.
+            elite_size (int): Number of fittest chord sequences carried over
+                unchanged to the next generation (elitism). Must be smaller
+                than the population size.
+            patience (int): Number of generations without improvement of the
+                best fitness after which the evolution stops early, at least
+                1. If None, all the generations are evolved.
+            tol (float): Minimum increase of the best fitness that counts as
+                an improvement, non-negative.
         """
+        if selection not in ("tournament", "roulette"):
+            raise ValueError(f"Unknown selection method: {selection}")
+        unknown_chords = set(chords) - set(fitness_evaluator.chord_mappings)
+        if unknown_chords:
+            raise ValueError(f"Unknown chords: {sorted(unknown_chords)}")
+        if not 0 <= elite_size < population_size:
+            raise ValueError(
+                f"Elite size must be non-negative and smaller than the "
+                f"population size ({population_size}), got {elite_size}"
+            )
+        if patience is not None and patience < 1:
+            raise ValueError(
+                f"Patience must be None or at least 1, got {patience}"
+            )
+        if tol < 0:
+            raise ValueError(f"Tolerance must be non-negative, got {tol}")
         self.melody_data = melody_data
         self.chords = chords
         self.mutation_rate = mutation_rate
         self.population_size = population_size
         self.fitness_evaluator = fitness_evaluator
-        self._population = []
+        self.rng = np.random.default_rng(seed)
+        self.n_workers = n_workers
+        self.selection = selection
+        self.elite_size = elite_size
+        self.patience = patience
+        self.tol = tol
+        # Identifiers of the available chords in the fitness evaluator
+        chord_ids = metrics.chord_ids(fitness_evaluator.chord_mappings)
+        self._chord_ids = np.array(
+            [chord_ids[chord] for chord in chords], dtype=np.int8
+        )
+        self._chord_names = list(fitness_evaluator.chord_mappings)
+        self._population = None
+        self._pool = None
 
     def generate(self, generations=1000):
         """
         Generates a chord sequence that harmonizes a melody using a genetic
-        algorithm.
+        algorithm. The evolution stops early once the best fitness has not
+        improved for `patience` generations.
 
         Parameters:
-            generations (int): Number of generations for evolution.
+            generations (int): Maximum number of generations for evolution.
 
         Returns:
             best_chord_sequence (list): Harmonization with the highest fitness
                 found in the last generation.
         """
-        self._population = self._initialise_population()
-        for _ in range(generations):
-            parents = self._select_parents()
-            new_population = self._create_new_population(parents)
-            self._population = new_population
+        if self.n_workers > 1:
+            self._pool = multiprocessing.Pool(
+                self.n_workers,
+                initializer=_init_worker,
+                initargs=(self.fitness_evaluator,),
+            )
+        try:
+            self._population = self._initialise_population()
+            best_fitness = -np.inf
+            stale_generations = 0
+            for _ in range(generations):
+                fitness_values = self._evaluate_population()
+                if fitness_values.max() - best_fitness < self.tol:
+                    stale_generations += 1
+                else:
+                    best_fitness = fitness_values.max()
+                    stale_generations = 0
+                if (
+                    self.patience is not None
+                    and stale_generations >= self.patience
+                ):
+                    break
+                elite = self._select_elite(fitness_values)
+                parents = self._select_parents(fitness_values)
+                new_population = self._create_new_population(parents, elite)
+                self._population = new_population
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
         best_chord_sequence = (
             self.fitness_evaluator.get_chord_sequence_with_highest_fitness(
                 self._population
             )
         )
-        return best_chord_sequence
+        return [self._chord_names[chord_id] for chord_id in best_chord_sequence]
 
     def _initialise_population(self):
         """
-        Initializes population with random chord sequences.
+        Initializes population with random chord sequences, with as many
+        chords as twice the number of bars in the melody.
 
         Returns:
-            list: List of randomly generated chord sequences.
+            np.ndarray: Randomly generated chord sequences, one per row.
         """
-        return [
-            self._generate_random_chord_sequence()
-            for _ in range(self.population_size)
+        return self._chord_ids[
+            self.rng.integers(
+                0,
+                len(self._chord_ids),
+                size=(
+                    self.population_size,
+                    2*self.melody_data.number_of_bars, # 2 chords per bar
+                ),
+                dtype=np.int8,
+            )
         ]
 
-    def _generate_random_chord_sequence(self):
+    def _select_elite(self, fitness_values):
         """
-        Generate a random chord sequence with as many chords as the numbers
-        of bars in the melody.
+        Selects the fittest chord sequences of the current population, which
+        are carried over unchanged to the next generation.
+
+        Parameters:
+            fitness_values (np.ndarray): Fitness of each chord sequence.
 
         Returns:
-            list: List of randomly generated chords.
+            np.ndarray: Elite chord sequences, one per row.
         """
-        return [
-            random.choice(self.chords)
-            for _ in range(2*self.melody_data.number_of_bars) # 2 chords per bar
+        elite = np.argsort(fitness_values, kind="stable")[
+            len(fitness_values) - self.elite_size:
         ]
+        return self._population[elite]
 
-    def _select_parents(self):
+    def _select_parents(self, fitness_values):
         """
-        Selects parent sequences for breeding based on fitness.
+        Selects parent sequences for breeding based on fitness, using the
+        configured selection method. Enough parents are selected to breed, in
+        pairs, the chord sequences that are not carried over by elitism.
+
+        Parameters:
+            fitness_values (np.ndarray): Fitness of each chord sequence.
 
         Returns:
-            list: Selected parent chord sequences.
+            np.ndarray: Row indices of the selected parent chord sequences.
         """
-        fitness_values = [
-            self.fitness_evaluator.evaluate(seq) for seq in self._population
-        ]
-        return random.choices(
-            self._population, weights=fitness_values, k=self.population_size
+        number_of_children = self.population_size - self.elite_size
+        number_of_parents = number_of_children + number_of_children % 2
+        if self.selection == "tournament":
+            return self._tournament_selection(fitness_values, number_of_parents)
+        return self._roulette_selection(fitness_values, number_of_parents)
+
+    def _tournament_selection(self, fitness_values, number_of_parents):
+        """
+        Selects each parent as the fitter of two randomly drawn chord
+        sequences (binary tournament selection).
+
+        Parameters:
+            fitness_values (np.ndarray): Fitness of each chord sequence.
+            number_of_parents (int): Number of parents to select.
+
+        Returns:
+            np.ndarray: Row indices of the selected parent chord sequences.
+        """
+        contenders = self.rng.integers(
+            0, len(fitness_values), size=(number_of_parents, 2)
+        )
+        return np.where(
+            fitness_values[contenders[:, 0]] >= fitness_values[contenders[:, 1]],
+            contenders[:, 0],
+            contenders[:, 1],
+        )
+
+    def _roulette_selection(self, fitness_values, number_of_parents):
+        """
+        Selects parents with probability proportional to their fitness
+        (roulette wheel selection).
+
+        Parameters:
+            fitness_values (np.ndarray): Fitness of each chord sequence.
+            number_of_parents (int): Number of parents to select.
+
+        Returns:
+            np.ndarray: Row indices of the selected parent chord sequences.
+        """
+        return self.rng.choice(
+            len(fitness_values),
+            size=number_of_parents,
+            p=fitness_values / fitness_values.sum(),
         )
 
-    def _create_new_population(self, parents):
+    def _evaluate_population(self):
+        """
+        Evaluates the fitness of the current population, splitting it among
+        the worker processes if there are several.
+
+        Returns:
+            np.ndarray: Fitness of each chord sequence in the population.
+        """
+        if self._pool is None:
+            return self.fitness_evaluator.evaluate_population(self._population)
+        chunks = np.array_split(self._population, self.n_workers)
+        return np.concatenate(self._pool.map(_evaluate_chunk, chunks))
+
+    def _create_new_population(self, parents, elite):
         """
         Generates a new population of chord sequences from the provided parents.
 
@@ -158,69 +442,171 @@ class GeneticMelodyHarmonizer:
         and mutation operations. For each pair of parent chord sequences,
         it generates two children. Each child is the result of a crossover
         operation between the pair of parents, followed by a potential
-        mutation. The new population is formed by collecting all these
-        children.
+        mutation. The new population is formed by the elite chord sequences,
+        unchanged, followed by these children.
 
         The method ensures that the new population size is equal to the
         predefined population size of the generator. It processes parents in
-        pairs, and for each pair, two children are generated.
+        pairs, and for each pair, two children are generated. All the children
+        are generated at once with vectorized operations on the population.
+        If the number of children needed is odd, the last child is dropped.
 
         Parameters:
-            parents (list): A list of parent chord sequences from which to
-                generate the new population.
+            parents (np.ndarray): Row indices of the parent chord sequences in
+                the current population from which to generate the new
+                population.
+            elite (np.ndarray): Elite chord sequences, one per row.
 
         Returns:
-            list: A new population of chord sequences, generated from the
-                parents.
+            np.ndarray: A new population of chord sequences, generated from
+                the parents.
 
         Note:
-            This method assumes an even population size and that the number of
-            parents is equal to the predefined population size.
+            This method assumes an even number of parents.
         """
-        new_population = []
-        for i in range(0, self.population_size, 2):
-            child1, child2 = self._crossover(
-                parents[i], parents[i + 1]
-            ), self._crossover(parents[i + 1], parents[i])
-            child1 = self._mutate(child1)
-            child2 = self._mutate(child2)
-            new_population.extend([child1, child2])
-        return new_population
+        parents = np.asarray(parents)
+        # Swap the parents of each pair to get the partner of every parent
+        partners = parents.reshape(-1, 2)[:, ::-1].ravel()
+        children = self._crossover(
+            self._population[parents], self._population[partners]
+        )
+        children = self._mutate(children)
+        return np.concatenate(
+            (elite, children[:self.population_size - len(elite)])
+        )
 
-    def _crossover(self, parent1, parent2):
+    def _crossover(self, parents1, parents2):
         """
-        Combines two parent sequences into a new child sequence using one-point
-        crossover.
+        Combines pairs of parent sequences into new child sequences using
+        one-point crossover, with a random cut index for each child.
 
         Parameters:
-            parent1 (list): First parent chord sequence.
-            parent2 (list): Second parent chord sequence.
+            parents1 (np.ndarray): First parent of each child, one per row.
+            parents2 (np.ndarray): Second parent of each child, one per row.
 
         Returns:
-            list: Resulting child chord sequence.
+            np.ndarray: Resulting child chord sequences, one per row.
         """
-        cut_index = random.randint(1, len(parent1) - 1)
-        return parent1[:cut_index] + parent2[cut_index:]
+        sequence_length = parents1.shape[1]
+        cut_indices = self.rng.integers(
+            1, sequence_length, size=(len(parents1), 1)
+        )
+        return np.where(
+            np.arange(sequence_length) < cut_indices, parents1, parents2
+        )
 
-    def _mutate(self, chord_sequence):
+    def _mutate(self, chord_sequences):
         """
-        Mutates a chord in the sequence based on mutation rate.
+        Mutates a chord in each sequence based on mutation rate.
 
         Parameters:
-            chord_sequence (list): Chord sequence to mutate.
+            chord_sequences (np.ndarray): Chord sequences to mutate, one per
+                row. They are mutated in place.
 
         Returns:
-            list: Mutated chord sequence.
+            np.ndarray: Mutated chord sequences.
         """
-        if random.random() < self.mutation_rate:
-            mutation_index = random.randint(0, len(chord_sequence) - 1)
-            chord_sequence[mutation_index] = random.choice(self.chords)
-        return chord_sequence
+        mutated = np.flatnonzero(
+            self.rng.random(len(chord_sequences)) < self.mutation_rate
+        )
+        mutation_indices = self.rng.integers(
+            0, chord_sequences.shape[1], size=len(mutated)
+        )
+        chord_sequences[mutated, mutation_indices] = self._chord_ids[
+            self.rng.integers(0, len(self._chord_ids), size=len(mutated))
+        ]
+        return chord_sequences
+
+
+# Fitness evaluator of each worker process. It is sent once when the pool
+# starts, so that only the chord sequences are sent on every generation.
+_worker_fitness_evaluator = None
+
+
+def _init_worker(fitness_evaluator):
+    """
+    Stores the fitness evaluator used by a worker process.
+
+    Parameters:
+        fitness_evaluator (FitnessEvaluator): Evaluator for chord fitness.
+    """
+    global _worker_fitness_evaluator
+    _worker_fitness_evaluator = fitness_evaluator
+
+
+def _evaluate_chunk(population):
+    """
+    Evaluates the fitness of a chunk of the population in a worker process.
+
+    Parameters:
+        population (np.ndarray): Chord sequences to evaluate, one per row.
+
+    Returns:
+        np.ndarray: The overall fitness score of each chord sequence.
+    """
+    return _worker_fitness_evaluator.evaluate_population(population)
+
+
+def _chord_tables(
+    chord_mappings, preferred_transitions, chords_with_parallel_fifths,
+    common_progressions
+):
+    """
+    Gets the chord lookup tables of the metrics, building them only the first
+    time the same chords are given. The chords are frozen into a snapshot of
+    their current contents, so that changing them in place builds new tables.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
+        preferred_transitions (dict): Preferred chord transitions.
+        chords_with_parallel_fifths (set): Chords with parallel fifths.
+        common_progressions (list): Common functional chord progressions.
+
+    Returns:
+        tuple: Lookup tables, in the order expected by `metrics.fitness`.
+    """
+    return _build_tables(
+        tuple((chord, tuple(notes)) for chord, notes in chord_mappings.items()),
+        tuple(
+            (chord, tuple(next_chords))
+            for chord, next_chords in preferred_transitions.items()
+        ),
+        frozenset(frozenset(pair) for pair in chords_with_parallel_fifths),
+        tuple(tuple(progression) for progression in common_progressions),
+    )
+
+
+@functools.lru_cache(maxsize=16)
+def _build_tables(
+    chord_mappings, preferred_transitions, chords_with_parallel_fifths,
+    common_progressions
+):
+    """
+    Builds the chord lookup tables of the metrics once per snapshot of the
+    chords, so that they are shared by every FitnessEvaluator using the same
+    chords (and inherited by forked worker processes).
+
+    Parameters:
+        chord_mappings (tuple): Pairs of chords and their notes.
+        preferred_transitions (tuple): Pairs of chords and their preferred
+            next chords.
+        chords_with_parallel_fifths (frozenset): Chords with parallel fifths.
+        common_progressions (tuple): Common functional chord progressions.
+
+    Returns:
+        tuple: Lookup tables, in the order expected by `metrics.fitness`.
+    """
+    return metrics.chord_tables(
+        dict(chord_mappings), dict(preferred_transitions),
+        chords_with_parallel_fifths, common_progressions
+    )
 
 
 class FitnessEvaluator:
     """
     Evaluates the fitness of a chord sequence based on various musical criteria.
+    Chord sequences are `np.int8` arrays of chord identifiers, i.e. indices
+    into `chord_mappings`.
 
     Attributes:
         melody (list): List of tuples representing notes as (pitch, duration).
@@ -229,15 +615,24 @@ class FitnessEvaluator:
         preferred_transitions (dict): Preferred chord transitions.
         chords_with_parallel_fifths (set): Chords with parallel fifths.
         common_progressions (list): Common functional chord progressions.
+        cache_size (int): Maximum number of fitness scores kept in the cache.
     """
 
     def __init__(
-        self, melody_data, chord_mappings, weights, preferred_transitions,
-        chords_with_parallel_fifths, common_progressions
+        self,
+        melody_data,
+        chord_mappings=CHORD_MAPPINGS,
+        weights=WEIGHTS,
+        preferred_transitions=PREFERRED_TRANSITIONS,
+        chords_with_parallel_fifths=CHORDS_WITH_PARALLEL_FIFTHS,
+        common_progressions=COMMON_PROGRESSIONS,
+        cache_size=8192,
     ):
         """
         Initialize the FitnessEvaluator with melody, chords, weights, and
-        preferred transitions.
+        preferred transitions. The chord tables default to the module
+        constants. Their lookup tables are only built once for the same
+        chords.
 
         Parameters:
             melody_data (MelodyData): Melody information.
@@ -246,6 +641,8 @@ class FitnessEvaluator:
             preferred_transitions (dict): Preferred chord transitions.
             chords_with_parallel_fifths (set): Chords with parallel fifths.
             common_progressions (list): Common functional chord progressions.
+            cache_size (int): Maximum number of fitness scores kept in the
+                cache before it is cleared.
         """
         self.melody_data = melody_data
         self.chord_mappings = chord_mappings
@@ -253,50 +650,150 @@ class FitnessEvaluator:
         self.preferred_transitions = preferred_transitions
         self.chords_with_parallel_fifths = chords_with_parallel_fifths
         self.common_progressions = common_progressions
+        self.cache_size = cache_size
+        # Number of chords the lookup tables are built for, even if the chord
+        # mappings are changed in place afterwards
+        self._total_chords = len(chord_mappings)
+        # Fitness scores of already evaluated chord sequences. The scores only
+        # depend on the sequence, so duplicated individuals across (and
+        # within) generations are evaluated once.
+        self._cache = {}
+
+        chord_tables = _chord_tables(
+            chord_mappings, preferred_transitions, chords_with_parallel_fifths,
+            common_progressions
+        )
+        # Weights and lookup tables of the metrics, as expected by the fused
+        # fitness kernel, which calculates all the metrics in a single call
+        self._weights = np.array(
+            [weights.get(metric, 0) for metric in metrics.FITNESS_METRICS],
+            dtype=float,
+        )
+        self._tables = (
+            *metrics.melody_tables(melody_data, chord_mappings), *chord_tables
+        )
 
     def get_chord_sequence_with_highest_fitness(self, chord_sequences):
         """
         Returns the chord sequence with the highest fitness score.
 
         Parameters:
-            chord_sequences (list): List of chord sequences to evaluate.
+            chord_sequences (np.ndarray): Chord sequences to evaluate, one per
+                row.
 
         Returns:
-            list: Chord sequence with the highest fitness score.
+            np.ndarray: Chord sequence with the highest fitness score.
         """
-        return max(chord_sequences, key=self.evaluate)
+        return chord_sequences[
+            np.argmax(self.evaluate_population(chord_sequences))
+        ]
 
     def evaluate(self, chord_sequence):
         """
-        Evaluate the fitness of a given chord sequence.
+        Evaluate the fitness of a given chord sequence, reusing the cached
+        score if the sequence has already been evaluated.
 
         Parameters:
-            chord_sequence (list): The chord sequence to evaluate.
+            chord_sequence (np.ndarray or list): The chord identifiers to
+                evaluate.
 
         Returns:
             float: The overall fitness score of the chord sequence.
         """
-        metric_classes = [
-            metrics.ChordMelodyCongruence(self.melody_data, self.chord_mappings),
-            metrics.ChordVariety(self.chord_mappings),
-            metrics.HarmonicFlow(self.preferred_transitions),
-            metrics.FunctionalHarmony(),
-            metrics.VoiceLeading(self.chord_mappings),
-            metrics.ChordRepetitions(),
-            metrics.FunctionalProgressions(self.common_progressions),
-            metrics.NonDiatonicChords(),
-            metrics.ParallelFifths(self.chords_with_parallel_fifths),
-        ]
+        chord_sequence = np.asarray(chord_sequence, dtype=np.int8)
+        self._check_chord_sequences(chord_sequence)
+        key = chord_sequence.tobytes()
+        score = self._cache.get(key)
+        if score is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            score = self._cache[key] = self._evaluate_uncached(
+                chord_sequence
+            )
+        return score
+
+    def evaluate_population(self, population):
+        """
+        Evaluate the fitness of every chord sequence in a population at once,
+        reusing the cached scores of the sequences already evaluated.
+
+        Parameters:
+            population (np.ndarray): Chord sequences to evaluate, one per row.
+
+        Returns:
+            np.ndarray: The overall fitness score of each chord sequence.
+        """
+        population = np.asarray(population, dtype=np.int8)
+        self._check_chord_sequences(population)
+        keys = [chord_sequence.tobytes() for chord_sequence in population]
+        scores = np.array([self._cache.get(key, np.nan) for key in keys])
+        missing = np.isnan(scores)
+        if missing.any():
+            scores[missing] = self._evaluate_population_uncached(
+                population[missing]
+            )
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache.update(
+                (key, score)
+                for key, score, is_missing in zip(keys, scores.tolist(), missing)
+                if is_missing
+            )
+        return scores
 
-        # Loop through each metric instance and apply the respective weight
-        total_score = 0
-        for metric_instance in metric_classes:
-            metric_name = metric_instance.__class__.__name__
-            metric_score = metric_instance.calculate(chord_sequence)
-            metric_weight = self.weights.get(metric_name, 0)
-            total_score += metric_score * metric_weight
+    def _check_chord_sequences(self, chord_sequences):
+        """
+        Check that chord sequences have one chord per slot of the melody and
+        only known chord identifiers, since the fitness kernel does not check
+        the bounds of its tables.
 
-        return total_score
+        Parameters:
+            chord_sequences (np.ndarray): Chord sequences to check, as a
+                single sequence or one sequence per row.
+        """
+        total_slots = 2 * self.melody_data.number_of_bars
+        length = chord_sequences.shape[-1]
+        if length != total_slots:
+            raise ValueError(
+                f"Expected chord sequences of {total_slots} chords, "
+                f"got {length}"
+            )
+        if chord_sequences.size and (
+            chord_sequences.min() < 0
+            or chord_sequences.max() >= self._total_chords
+        ):
+            raise ValueError(
+                f"Chord identifiers must be between 0 and "
+                f"{self._total_chords - 1}"
+            )
+
+    def _evaluate_uncached(self, chord_sequence):
+        """
+        Evaluate the fitness of a given chord sequence by calculating every
+        weighted metric.
+
+        Parameters:
+            chord_sequence (np.ndarray): The chord sequence to evaluate.
+
+        Returns:
+            float: The overall fitness score of the chord sequence.
+        """
+        return metrics.fitness(chord_sequence, self._weights, *self._tables)
+
+    def _evaluate_population_uncached(self, population):
+        """
+        Evaluate the fitness of every chord sequence in a population by
+        calculating every weighted metric.
+
+        Parameters:
+            population (np.ndarray): Chord sequences to evaluate, one per row.
+
+        Returns:
+            np.ndarray: The overall fitness score of each chord sequence.
+        """
+        return metrics.population_fitness(
+            population, self._weights, *self._tables
+        )
 
 
 def create_score(melody, chord_sequence, chord_mappings):
@@ -307,6 +804,7 @@ def create_score(melody, chord_sequence, chord_mappings):
         melody (list): A list of tuples representing notes in the format
             (note_name, duration).
         chord_sequence (list): A list of chord names.
+        chord_mappings (dict): Available chords mapped to their notes.
 
     Returns:
         music21.stream.Score: A music score containing the melody and chord
@@ -315,26 +813,28 @@ def create_score(melody, chord_sequence, chord_mappings):
     # Create a Score object
     score = music21.stream.Score()
 
-    # Create the melody part and add notes to it
+    # Create the melody part and add all its notes at once
     melody_part = music21.stream.Part()
-    for note_name, duration in melody:
-        melody_note = music21.note.Note(note_name, quarterLength=duration)
-        melody_part.append(melody_note)
+    melody_part.append(
+        [
+            music21.note.Note(note_name, quarterLength=duration)
+            for note_name, duration in melody
+        ]
+    )
 
-    # Create the chord part and add chords to it
+    # Create the chord part and insert all its chords at once, as a flat
+    # list of offsets and chords
     chord_part = music21.stream.Part()
-    current_duration = 0  # Track the duration for chord placement
-
-    for chord_name in chord_sequence:
+    offsets_and_chords = []
+    for chord_index, chord_name in enumerate(chord_sequence):
         # Translate chord names to note lists
         chord_notes_list = chord_mappings.get(chord_name, [])
-        # Create a music21 chord
+        # Create a music21 chord lasting 2 beats, i.e. half a bar
         chord_notes = music21.chord.Chord(
             chord_notes_list, quarterLength=2
         )  # Assuming 4/4 time signature
-        chord_notes.offset = current_duration
-        chord_part.append(chord_notes)
-        current_duration += 2  # Increase by 2 beats
+        offsets_and_chords.extend((2 * chord_index, chord_notes))
+    chord_part.insert(offsets_and_chords)
 
     # Append parts to the score
     score.append(melody_part)
@@ -345,148 +845,23 @@ def create_score(melody, chord_sequence, chord_mappings):
 
 def main():
 
-    # Set random seed for reproducibility
-    random.seed(2)
-    
-    # Define the melody
-    twinkle_twinkle_melody = [
-        ("C5", 1),
-        ("C5", 1),
-        ("G5", 1),
-        ("G5", 1),
-        ("A5", 1),
-        ("A5", 1),
-        ("G5", 2),  # Twinkle, twinkle, little star,
-        ("F5", 1),
-        ("F5", 1),
-        ("E5", 1),
-        ("E5", 1),
-        ("D5", 1),
-        ("D5", 1),
-        ("C5", 2),  # How I wonder what you are!
-        ("G5", 1),
-        ("G5", 1),
-        ("F5", 1),
-        ("F5", 1),
-        ("E5", 1),
-        ("E5", 1),
-        ("D5", 2),  # Up above the world so high,
-        ("G5", 1),
-        ("G5", 1),
-        ("F5", 1),
-        ("F5", 1),
-        ("E5", 1),
-        ("E5", 1),
-        ("D5", 2),  # Like a diamond in the sky.
-        ("C5", 1),
-        ("C5", 1),
-        ("G5", 1),
-        ("G5", 1),
-        ("A5", 1),
-        ("A5", 1),
-        ("G5", 2),  # Twinkle, twinkle, little star,
-        ("F5", 1),
-        ("F5", 1),
-        ("E5", 1),
-        ("E5", 1),
-        ("D5", 1),
-        ("D5", 1),
-        ("C5", 2)  # How I wonder what you are!
-    ]
-
-    # Define weights for fitness evaluation
-    weights = {
-        "ChordMelodyCongruence": 0.24,
-        "ChordVariety": 0.08,
-        "HarmonicFlow": 0.18,
-        "FunctionalHarmony": 0.10,
-        "VoiceLeading": 0.02,
-        "ChordRepetitions": 0.06,
-        "NonDiatonicChords": 0.06,
-        "FunctionalProgressions": 0.25,
-        "ParallelFifths": 0.01,
-    }
-
-    # Define set of chords and their note mappings for harmonization
-    chord_mappings = {
-        "Cmaj7": ["C", "E", "G", "B"],
-        "Dm7": ["D", "F", "A", "C"],
-        "Em7": ["E", "G", "B", "D"],
-        "Fmaj7": ["F", "A", "C", "E"],
-        "G7": ["G", "B", "D", "F"],
-        "Am7": ["A", "C", "E", "G"],
-        "Bm7b5": ["B", "D", "F", "A"],
-        "C7": ["C", "E", "G", "Bb"],
-        "D7": ["D", "F#", "A", "C"],
-        "E7": ["E", "G#", "B", "D"],
-        "A7": ["A", "C#", "E", "G"],
-        "Dm7b5": ["D", "F", "Ab", "C"],
-        "Eº7": ["E", "G", "Bb", "Db"],
-        "Gmin7": ["G", "Bb", "D", "F"],
-    }
-
-    # Define preferred transitions between chords
-    preferred_transitions = {
-        "Cmaj7": ["Em7", "Fmaj7", "Am7", "C7", "E7", "A7", "Eº7"],
-        "Dm7": ["G7", "Am7", "Bm7b5", "D7"],
-        "Em7": ["Am7", "A7", "Eº7", "Gmin7"],
-        "Fmaj7": ["Cmaj7", "Em7", "G7", "Bm7b5", "D7", "E7", "Dm7b5"],
-        "G7": ["Cmaj7", "Am7", "Em7"],
-        "Am7": ["Dm7", "Fmaj7", "Gmin7", "Dm7b5"],
-        "Bm7b5": ["Em7", "E7"],
-        "C7": ["Fmaj7"],
-        "D7": ["G7"],
-        "E7": ["Am7"],
-        "A7": ["Dm7"],
-        "Dm7b5": ["Cmaj7", "Em7"],
-        "Eº7": ["Dm7", "Fmaj7"],
-        "Gmin7": ["C7", "Eº7"],
-    }
-
-    # Define chord transitions with parallel fifths
-    chords_with_parallel_fifths = {
-        frozenset(["Cmaj7", "Dm7"]),
-        frozenset(["Cmaj7", "D7"]),
-        frozenset(["Dm7", "Em7"]),
-        frozenset(["Dm7", "E7"]),
-        frozenset(["Em7", "D7"]),
-        frozenset(["Am7", "Bm7b5"]),
-        frozenset(["Bm7b5", "Cmaj7"]),
-        frozenset(["Bm7b5", "C7"]),
-        frozenset(["D7", "E7"]),
-    }
-
-    # Define common functional chord progressions
-    common_progressions = [
-        ["Dm7", "G7", "Cmaj7"],
-        ["Fmaj7", "Dm7b5", "Cmaj7"],
-        ["Em7", "A7", "Dm7"],
-        ["Cmaj7", "Eº7", "Dm7"],
-        ["Fmaj7", "Bm7b5", "Em7"],
-        ["Fmaj7", "Bm7b5", "E7"],
-        ["Gmin7", "C7", "Fmaj7"],
-        ["Am7", "D7", "G7"],
-        ["Am7", "Dm7", "G7"],
-        ["Bm7b5", "E7", "Am7"],
-        ["Bm7b5", "Em7", "Am7"],
-    ]
-
     # Instantiate objects for generating harmonization
-    melody_data = MelodyData(twinkle_twinkle_melody)
+    melody_data = MelodyData(TWINKLE_TWINKLE_MELODY)
     fitness_evaluator = FitnessEvaluator(
         melody_data=melody_data,
-        weights=weights,
-        chord_mappings=chord_mappings,
-        preferred_transitions=preferred_transitions,
-        chords_with_parallel_fifths=chords_with_parallel_fifths,
-        common_progressions=common_progressions,
+        weights=WEIGHTS,
+        chord_mappings=CHORD_MAPPINGS,
+        preferred_transitions=PREFERRED_TRANSITIONS,
+        chords_with_parallel_fifths=CHORDS_WITH_PARALLEL_FIFTHS,
+        common_progressions=COMMON_PROGRESSIONS,
     )
     harmonizer = GeneticMelodyHarmonizer(
         melody_data=melody_data,
-        chords=list(chord_mappings.keys()),
+        chords=list(CHORD_MAPPINGS.keys()),
         population_size=100,
         mutation_rate=0.05,
         fitness_evaluator=fitness_evaluator,
+        seed=2,  # Set random seed for reproducibility
     )
 
     # Generate chords with genetic algorithm
@@ -494,7 +869,7 @@ def main():
 
     # Render to music21 score and show it
     music21_score = create_score(
-        twinkle_twinkle_melody, generated_chords, chord_mappings
+        TWINKLE_TWINKLE_MELODY, generated_chords, CHORD_MAPPINGS
     )
     music21_score.show()
 
@@ -1,11 +1,488 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
+from numba import njit
+
+
+# Pitch classes of the natural notes and the offsets of the accidentals
+NATURAL_PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+ACCIDENTALS = {"#": 1, "b": -1}
+
+# Maximum number of chords, so that any set of chords fits in a 64-bit mask
+MAX_CHORDS = 64
+
+
+def pitch_class(note_name):
+    """
+    Get the pitch class of a note name, ignoring its octave.
+
+    Parameters:
+        note_name (str): Note name such as "C", "F#" or "Bb5".
+
+    Returns:
+        int: Pitch class of the note, from 0 (C) to 11 (B).
+    """
+    pitch = NATURAL_PITCH_CLASSES[note_name[0]]
+    for accidental in note_name[1:]:
+        pitch += ACCIDENTALS.get(accidental, 0)
+    return pitch % 12
+
+
+def chord_ids(chord_mappings):
+    """
+    Encode the available chords as small integers. Chord sequences are
+    represented as `np.int8` arrays of these identifiers.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes, at
+            most `MAX_CHORDS`.
+
+    Returns:
+        dict: Chord names mapped to their position in `chord_mappings`.
+    """
+    if len(chord_mappings) > MAX_CHORDS:
+        raise ValueError(
+            f"At most {MAX_CHORDS} chords are supported, "
+            f"got {len(chord_mappings)}"
+        )
+    return {chord: chord_id for chord_id, chord in enumerate(chord_mappings)}
+
+
+def chord_masks(chord_mappings):
+    """
+    Encode the notes of each chord as a 12-bit pitch-class bitmask, where bit
+    `p` is set if the chord contains pitch class `p`.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
+
+    Returns:
+        np.ndarray: Bitmask of each chord, indexed by chord identifier.
+    """
+    masks = np.zeros(len(chord_mappings), dtype=np.uint16)
+    for chord_id, notes in enumerate(chord_mappings.values()):
+        for note in notes:
+            masks[chord_id] |= 1 << pitch_class(note)
+    return masks
+
+
+def chord_flags(chord_mappings, chords):
+    """
+    Flag the given chords in a boolean array indexed by chord identifier.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
+        chords (iterable): Chords to flag.
+
+    Returns:
+        np.ndarray: True for the identifiers of the given chords.
+    """
+    chords = set(chords)
+    return np.array([chord in chords for chord in chord_mappings], dtype=bool)
+
+
+# Numba kernels computing each metric over an `np.int8` array of chord
+# identifiers and the lookup tables precomputed by the metric classes. Each
+# metric is split into a step, accumulating the contribution of the chord at
+# position `i`, and a score, normalizing the accumulated value. The metric
+# kernels and the fused `fitness` kernel share these steps and scores, so
+# that every formula is written once.
+# Compiled functions are cached on disk to avoid recompiling them on import.
+
+@njit(cache=True)
+def _chord_melody_congruence_step(chord_sequence, i, slot_scores):
+    return slot_scores[i, chord_sequence[i]]
+
+
+@njit(cache=True)
+def _chord_melody_congruence_score(congruence, melody_duration):
+    return congruence / melody_duration
+
+
+@njit(cache=True)
+def _chord_variety_step(chord_sequence, i, seen):
+    # Bitmask of the chords seen so far, where bit `c` is set for chord `c`
+    return seen | (np.int64(1) << chord_sequence[i])
+
+
+@njit(cache=True)
+def _chord_variety_score(seen, total_chords):
+    unique_chords = 0
+    while seen:
+        seen &= seen - 1
+        unique_chords += 1
+    return unique_chords / total_chords
+
+
+@njit(cache=True)
+def _harmonic_flow_step(chord_sequence, i, preferred):
+    if i >= 1 and preferred[chord_sequence[i - 1], chord_sequence[i]]:
+        return 1
+    return 0
+
+
+@njit(cache=True)
+def _harmonic_flow_score(correct_transitions, total_slots):
+    return correct_transitions / (total_slots - 1)
+
+
+@njit(cache=True)
+def _functional_harmony_score(
+    chord_sequence, seen, opening_chords, closing_chords, required_chords
+):
+    # Reuses the bitmask of the chords seen in the sequence of ChordVariety
+    score = 0.0
+    total_rules = 3
+    correct_function_score = 1 / total_rules
+    if opening_chords[chord_sequence[0]]:
+        score += correct_function_score
+    if closing_chords[chord_sequence[-1]]:
+        score += correct_function_score
+    found_chords = True
+    for required_chord in required_chords:
+        if required_chord < 0 or not (seen >> required_chord) & 1:
+            found_chords = False
+    if found_chords:
+        score += correct_function_score
+    return score
+
+
+@njit(cache=True)
+def _voice_leading_step(chord_sequence, i, shared_notes):
+    if i >= 1:
+        return shared_notes[chord_sequence[i - 1], chord_sequence[i]]
+    return 0
+
+
+@njit(cache=True)
+def _voice_leading_score(total_shared_notes, total_slots):
+    return total_shared_notes / (4 * (total_slots - 1))
+
+
+@njit(cache=True)
+def _chord_repetitions_step(chord_sequence, i):
+    repetition = 0
+    skip_repetition = 0
+    if i >= 1 and chord_sequence[i - 1] == chord_sequence[i]:
+        repetition = 1
+    if i >= 2 and chord_sequence[i - 2] == chord_sequence[i]:
+        skip_repetition = 1
+    return repetition, skip_repetition
+
+
+@njit(cache=True)
+def _chord_repetitions_score(repetitions, skip_repetitions, total_slots):
+    return (
+        1 - repetitions / (total_slots - 1)
+        - skip_repetitions / (total_slots - 2)
+    )
+
+
+@njit(cache=True)
+def _functional_progressions_step(chord_sequence, i, common_progressions):
+    if i >= 2 and common_progressions[
+        chord_sequence[i - 2], chord_sequence[i - 1], chord_sequence[i]
+    ]:
+        return 1
+    return 0
+
+
+@njit(cache=True)
+def _functional_progressions_score(matches, total_slots):
+    common_progression_score = 3 / (total_slots - 2)
+    return matches * common_progression_score
+
+
+@njit(cache=True)
+def _non_diatonic_chords_step(chord_sequence, i, non_diatonic_chords):
+    if non_diatonic_chords[chord_sequence[i]]:
+        return 1
+    return 0
+
+
+@njit(cache=True)
+def _non_diatonic_chords_score(count, total_slots):
+    return count / total_slots
+
+
+@njit(cache=True)
+def _parallel_fifths_step(chord_sequence, i, parallel_fifths):
+    if i >= 1 and parallel_fifths[chord_sequence[i - 1], chord_sequence[i]]:
+        return 1
+    return 0
+
+
+@njit(cache=True)
+def _parallel_fifths_score(count, total_slots):
+    return 1 - count / (total_slots - 1)
+
+
+@njit(cache=True)
+def _chord_melody_congruence(chord_sequence, slot_scores, melody_duration):
+    congruence = 0.0
+    for i in range(len(chord_sequence)):
+        congruence += _chord_melody_congruence_step(
+            chord_sequence, i, slot_scores
+        )
+    return _chord_melody_congruence_score(congruence, melody_duration)
+
+
+@njit(cache=True)
+def _chord_variety(chord_sequence, total_chords):
+    seen = 0
+    for i in range(len(chord_sequence)):
+        seen = _chord_variety_step(chord_sequence, i, seen)
+    return _chord_variety_score(seen, total_chords)
+
+
+@njit(cache=True)
+def _harmonic_flow(chord_sequence, preferred):
+    correct_transitions = 0
+    for i in range(len(chord_sequence)):
+        correct_transitions += _harmonic_flow_step(
+            chord_sequence, i, preferred
+        )
+    return _harmonic_flow_score(correct_transitions, len(chord_sequence))
+
+
+@njit(cache=True)
+def _functional_harmony(
+    chord_sequence, opening_chords, closing_chords, required_chords
+):
+    seen = 0
+    for i in range(len(chord_sequence)):
+        seen = _chord_variety_step(chord_sequence, i, seen)
+    return _functional_harmony_score(
+        chord_sequence, seen, opening_chords, closing_chords, required_chords
+    )
+
+
+@njit(cache=True)
+def _voice_leading(chord_sequence, shared_notes):
+    total_shared_notes = 0
+    for i in range(len(chord_sequence)):
+        total_shared_notes += _voice_leading_step(
+            chord_sequence, i, shared_notes
+        )
+    return _voice_leading_score(total_shared_notes, len(chord_sequence))
+
+
+@njit(cache=True)
+def _chord_repetitions(chord_sequence):
+    repetitions = 0
+    skip_repetitions = 0
+    for i in range(len(chord_sequence)):
+        repetition, skip_repetition = _chord_repetitions_step(
+            chord_sequence, i
+        )
+        repetitions += repetition
+        skip_repetitions += skip_repetition
+    return _chord_repetitions_score(
+        repetitions, skip_repetitions, len(chord_sequence)
+    )
+
+
+@njit(cache=True)
+def _functional_progressions(chord_sequence, common_progressions):
+    matches = 0
+    for i in range(len(chord_sequence)):
+        matches += _functional_progressions_step(
+            chord_sequence, i, common_progressions
+        )
+    return _functional_progressions_score(matches, len(chord_sequence))
+
+
+@njit(cache=True)
+def _non_diatonic_chords(chord_sequence, non_diatonic_chords):
+    count = 0
+    for i in range(len(chord_sequence)):
+        count += _non_diatonic_chords_step(
+            chord_sequence, i, non_diatonic_chords
+        )
+    return _non_diatonic_chords_score(count, len(chord_sequence))
+
+
+@njit(cache=True)
+def _parallel_fifths(chord_sequence, parallel_fifths):
+    count = 0
+    for i in range(len(chord_sequence)):
+        count += _parallel_fifths_step(chord_sequence, i, parallel_fifths)
+    return _parallel_fifths_score(count, len(chord_sequence))
+
+
+# Metrics combined by `fitness`, in the order of their weights
+FITNESS_METRICS = (
+    "ChordMelodyCongruence",
+    "ChordVariety",
+    "HarmonicFlow",
+    "FunctionalHarmony",
+    "VoiceLeading",
+    "ChordRepetitions",
+    "FunctionalProgressions",
+    "NonDiatonicChords",
+    "ParallelFifths",
+)
+
+
+@njit(cache=True)
+def fitness(
+    chord_sequence, weights, slot_scores, melody_duration, total_chords,
+    preferred, opening_chords, closing_chords, required_chords, shared_notes,
+    common_progressions, non_diatonic_chords, parallel_fifths
+):
+    """
+    Calculate the weighted sum of all the metrics for a given chord sequence
+    in a single pass over the sequence.
+
+    Parameters:
+        chord_sequence (np.ndarray): Chord identifiers to be evaluated.
+        weights (np.ndarray): Weight of each metric, in the order of
+            `FITNESS_METRICS`.
+        The remaining parameters are the lookup tables built by
+        `melody_tables` and `chord_tables`.
+
+    Returns:
+        float: The overall fitness score of the chord sequence.
+    """
+    total_slots = len(chord_sequence)
+    congruence = 0.0
+    seen = 0
+    correct_transitions = 0
+    total_shared_notes = 0
+    repetitions = 0
+    skip_repetitions = 0
+    matches = 0
+    non_diatonic = 0
+    parallel = 0
+    for i in range(total_slots):
+        congruence += _chord_melody_congruence_step(
+            chord_sequence, i, slot_scores
+        )
+        seen = _chord_variety_step(chord_sequence, i, seen)
+        correct_transitions += _harmonic_flow_step(
+            chord_sequence, i, preferred
+        )
+        total_shared_notes += _voice_leading_step(
+            chord_sequence, i, shared_notes
+        )
+        repetition, skip_repetition = _chord_repetitions_step(
+            chord_sequence, i
+        )
+        repetitions += repetition
+        skip_repetitions += skip_repetition
+        matches += _functional_progressions_step(
+            chord_sequence, i, common_progressions
+        )
+        non_diatonic += _non_diatonic_chords_step(
+            chord_sequence, i, non_diatonic_chords
+        )
+        parallel += _parallel_fifths_step(chord_sequence, i, parallel_fifths)
+
+    scores = (
+        _chord_melody_congruence_score(congruence, melody_duration),
+        _chord_variety_score(seen, total_chords),
+        _harmonic_flow_score(correct_transitions, total_slots),
+        _functional_harmony_score(
+            chord_sequence, seen, opening_chords, closing_chords,
+            required_chords
+        ),
+        _voice_leading_score(total_shared_notes, total_slots),
+        _chord_repetitions_score(repetitions, skip_repetitions, total_slots),
+        _functional_progressions_score(matches, total_slots),
+        _non_diatonic_chords_score(non_diatonic, total_slots),
+        _parallel_fifths_score(parallel, total_slots),
+    )
+    total_score = 0.0
+    for i in range(len(scores)):
+        total_score += scores[i] * weights[i]
+    return total_score
+
+
+@njit(cache=True)
+def population_fitness(population, weights, *tables):
+    """
+    Calculate the fitness of every chord sequence in a population.
+
+    Parameters:
+        population (np.ndarray): Chord identifiers to be evaluated, with one
+            chord sequence per row.
+        weights (np.ndarray): Weight of each metric, in the order of
+            `FITNESS_METRICS`.
+        tables: Lookup tables of the metrics, as passed to `fitness`.
+
+    Returns:
+        np.ndarray: The overall fitness score of each chord sequence.
+    """
+    scores = np.empty(len(population))
+    for i in range(len(population)):
+        scores[i] = fitness(population[i], weights, *tables)
+    return scores
+
+
+def melody_tables(melody_data, chord_mappings):
+    """
+    Build the lookup tables of the metrics that depend on the melody.
+
+    Parameters:
+        melody_data (MelodyData): Melody information.
+        chord_mappings (dict): Available chords mapped to their notes.
+
+    Returns:
+        tuple: Lookup tables, in the order of the melody parameters of
+            `fitness`.
+    """
+    congruence = ChordMelodyCongruence(melody_data, chord_mappings)
+    return congruence.slot_scores, melody_data.duration
+
+
+def chord_tables(
+    chord_mappings, preferred_transitions, chords_with_parallel_fifths,
+    common_progressions
+):
+    """
+    Build the lookup tables of the metrics that only depend on the chords,
+    i.e. every table but the melody ones.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
+        preferred_transitions (dict): Preferred chord transitions.
+        chords_with_parallel_fifths (set): Chords with parallel fifths.
+        common_progressions (list): Common functional chord progressions.
+
+    Returns:
+        tuple: Lookup tables, in the order of the parameters of `fitness`
+            following the melody ones.
+    """
+    variety = ChordVariety(chord_mappings)
+    flow = HarmonicFlow(chord_mappings, preferred_transitions)
+    harmony = FunctionalHarmony(chord_mappings)
+    voice_leading = VoiceLeading(chord_mappings)
+    progressions = FunctionalProgressions(chord_mappings, common_progressions)
+    non_diatonic = NonDiatonicChords(chord_mappings)
+    parallel_fifths = ParallelFifths(
+        chord_mappings, chords_with_parallel_fifths
+    )
+    return (
+        variety.total_chords,
+        flow.preferred,
+        harmony.opening_chords,
+        harmony.closing_chords,
+        harmony.required_chords,
+        voice_leading.shared_notes,
+        progressions.common_progressions,
+        non_diatonic.non_diatonic_chords,
+        parallel_fifths.parallel_fifths,
+    )
+
 
 class Metric(ABC):
     """
     Abstract base class for musical metrics.
-    Any metric class must implement the `calculate` method.
+    Any metric class must implement the `calculate` method, and declare the
+    lookup tables it stores in `__slots__`.
     """
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -13,10 +490,10 @@ class Metric(ABC):
     def calculate(self, chord_sequence):
         """
         Calculate the metric score for a given chord sequence.
-        
+
         Parameters:
-            chord_sequence (list): A list of chords to be evaluated.
-        
+            chord_sequence (np.ndarray): Chord identifiers to be evaluated.
+
         Returns:
             float: A score representing the evaluated metric.
         """
@@ -27,30 +504,43 @@ class ChordMelodyCongruence(Metric):
     """
     Calculates the congruence between the chord sequence and the melody.
     This class assesses how well each chord in the sequence aligns with
-    the corresponding segment of the melody. The alignment is measured 
-    by checking if the notes in the melody are present in the chords 
-    being played at the same time, rewarding sequences where the melody 
-    notes fit well with the chords.
+    the corresponding segment of the melody. The alignment is measured
+    by checking if the notes in the melody are present in the chords
+    being played at the same time, rewarding sequences where the melody
+    notes fit well with the chords. Each chord lasts half a bar (2 beats).
+
+    Since the melody is fixed, the duration of the melody notes fitting
+    each chord in each slot of the sequence is precomputed from the onset
+    of every note, splitting notes that sound over several slots, so that
+    calculating the metric only gathers one table entry per chord.
 
     Parameters:
         melody_data (MelodyData): Melody information.
         chord_mappings (dict): Available chords mapped to their notes.
     """
+    __slots__ = ("melody_data", "slot_scores")
+
     def __init__(self, melody_data, chord_mappings):
         self.melody_data = melody_data
-        self.chord_mappings = chord_mappings
+        masks = chord_masks(chord_mappings)
+        total_slots = 2 * melody_data.number_of_bars  # 2 chords per bar
+        self.slot_scores = np.zeros((total_slots, len(masks)))
+        onset = 0
+        for pitch, duration in melody_data.notes:
+            end = onset + duration
+            fitting_chords = (masks >> pitch_class(pitch)) & 1 == 1
+            # Add the part of the note sounding in every slot it overlaps
+            first_slot = int(onset // 2)
+            last_slot = min(int(np.ceil(end / 2)), total_slots)
+            for slot in range(first_slot, last_slot):
+                overlap = min(end, 2 * (slot + 1)) - max(onset, 2 * slot)
+                self.slot_scores[slot, fitting_chords] += overlap
+            onset = end
 
     def calculate(self, chord_sequence):
-        score, melody_index = 0, 0
-        for chord in chord_sequence:
-            bar_duration = 0
-            while bar_duration < 4 and melody_index < len(self.melody_data.notes):
-                pitch, duration = self.melody_data.notes[melody_index]
-                if pitch[0] in self.chord_mappings[chord]:
-                    score += duration
-                bar_duration += duration
-                melody_index += 1
-        return score / self.melody_data.duration
+        return _chord_melody_congruence(
+            chord_sequence, self.slot_scores, self.melody_data.duration
+        )
 
 
 class ChordVariety(Metric):
@@ -64,13 +554,13 @@ class ChordVariety(Metric):
     Parameters:
         chord_mappings (dict): Available chords mapped to their notes.
     """
+    __slots__ = ("total_chords",)
+
     def __init__(self, chord_mappings):
-        self.chord_mappings = chord_mappings
+        self.total_chords = len(chord_ids(chord_mappings))
 
     def calculate(self, chord_sequence):
-        unique_chords = len(set(chord_sequence))
-        total_chords = len(self.chord_mappings)
-        return unique_chords / total_chords
+        return _chord_variety(chord_sequence, self.total_chords)
 
 
 class HarmonicFlow(Metric):
@@ -81,20 +571,20 @@ class HarmonicFlow(Metric):
     musically pleasant transitions result in a higher score.
 
     Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
         preferred_transitions (dict): Preferred chord transitions.
     """
-    def __init__(self, preferred_transitions):
-        self.preferred_transitions = preferred_transitions
+    __slots__ = ("preferred",)
+
+    def __init__(self, chord_mappings, preferred_transitions):
+        ids = chord_ids(chord_mappings)
+        self.preferred = np.zeros((len(ids), len(ids)), dtype=bool)
+        for chord, next_chords in preferred_transitions.items():
+            for next_chord in next_chords:
+                self.preferred[ids[chord], ids[next_chord]] = True
 
     def calculate(self, chord_sequence):
-        score = 0
-        total_transitions = len(chord_sequence) - 1
-        correct_transition_score = 1 / total_transitions
-        for i in range(total_transitions):
-            next_chord = chord_sequence[i + 1]
-            if next_chord in self.preferred_transitions[chord_sequence[i]]:
-                score += correct_transition_score
-        return score
+        return _harmonic_flow(chord_sequence, self.preferred)
 
 
 class FunctionalHarmony(Metric):
@@ -104,18 +594,26 @@ class FunctionalHarmony(Metric):
     the tonic at the beginning and end of the sequence and the presence of
     subdominant and dominant chords. Adherence to these harmonic
     conventions is rewarded with a higher score.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
     """
+    __slots__ = ("opening_chords", "closing_chords", "required_chords")
+
+    def __init__(self, chord_mappings):
+        ids = chord_ids(chord_mappings)
+        self.opening_chords = chord_flags(chord_mappings, ["Cmaj7", "Fmaj7"])
+        self.closing_chords = chord_flags(chord_mappings, ["Cmaj7"])
+        # Missing chords get an identifier that never appears in a sequence
+        self.required_chords = np.array(
+            [ids.get(chord, -1) for chord in ["Fmaj7", "G7"]], dtype=np.int8
+        )
+
     def calculate(self, chord_sequence):
-        score = 0
-        total_rules = 3
-        correct_function_score = 1 / total_rules
-        if chord_sequence[0] in ["Cmaj7", "Fmaj7"]:
-            score += correct_function_score
-        if chord_sequence[-1] in ["Cmaj7"]:
-            score += correct_function_score
-        if "Fmaj7" in chord_sequence and "G7" in chord_sequence:
-            score += correct_function_score
-        return score
+        return _functional_harmony(
+            chord_sequence, self.opening_chords, self.closing_chords,
+            self.required_chords
+        )
 
 
 class VoiceLeading(Metric):
@@ -129,22 +627,20 @@ class VoiceLeading(Metric):
     Parameters:
         chord_mappings (dict): Available chords mapped to their notes.
     """
+    __slots__ = ("shared_notes",)
+
     def __init__(self, chord_mappings):
-        self.chord_mappings = chord_mappings
+        # Number of notes shared by each pair of chords
+        masks = chord_masks(chord_mappings).tolist()
+        self.shared_notes = np.array(
+            [[(mask & other_mask).bit_count() for other_mask in masks]
+             for mask in masks],
+            dtype=np.int8,
+        )
 
     def calculate(self, chord_sequence):
-        score = 0
-        total_transitions = len(chord_sequence) - 1
-        total_notes = 4 * total_transitions
-        shared_note_score = 1 / total_notes
-        for i in range(total_transitions):
-            current_chord = self.chord_mappings[chord_sequence[i]]
-            next_chord = self.chord_mappings[chord_sequence[i + 1]]
-            for note in current_chord:
-                if note in next_chord:
-                    score += shared_note_score
-        return score
-    
+        return _voice_leading(chord_sequence, self.shared_notes)
+
 
 class ChordRepetitions(Metric):
     """
@@ -154,18 +650,16 @@ class ChordRepetitions(Metric):
     progression, but excessive repetition can lead to monotony. This
     class penalizes sequences with repeated chords.
 
+    Both repeated successive chords and chords repeated after one other
+    chord are penalized, each normalized by its number of chord pairs
+    (the sequence length minus 1 and minus 2, respectively).
+
     Parameters:
     """
+    __slots__ = ()
+
     def calculate(self, chord_sequence):
-        score = 1
-        total_transitions = len(chord_sequence) - 2
-        same_chord_penalty = - 1 / total_transitions
-        for i in range(total_transitions):
-            if chord_sequence[i] == chord_sequence[i + 1]:
-                score += same_chord_penalty
-            if chord_sequence[i] == chord_sequence[i + 2]:
-                score += same_chord_penalty
-        return score
+        return _chord_repetitions(chord_sequence)
 
 
 class FunctionalProgressions(Metric):
@@ -177,19 +671,25 @@ class FunctionalProgressions(Metric):
     of well-established harmonic movements.
 
     Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
         common_progressions (list): Common functional chord progressions.
     """
-    def __init__(self, common_progressions):
-        self.common_progressions = common_progressions
+    __slots__ = ("common_progressions",)
+
+    def __init__(self, chord_mappings, common_progressions):
+        # Flag every common progression in an (N, N, N) table of chord triples
+        ids = chord_ids(chord_mappings)
+        self.common_progressions = np.zeros(
+            (len(ids), len(ids), len(ids)), dtype=bool
+        )
+        for progression in common_progressions:
+            progression_ids = tuple(ids[chord] for chord in progression)
+            self.common_progressions[progression_ids] = True
 
     def calculate(self, chord_sequence):
-        score = 0
-        total_transitions = len(chord_sequence) - 2
-        common_progression_score = 3 / (total_transitions)
-        for i in range(total_transitions):
-            if chord_sequence[i:i+3] in self.common_progressions:
-                score += common_progression_score
-        return score
+        return _functional_progressions(
+            chord_sequence, self.common_progressions
+        )
 
 
 class NonDiatonicChords(Metric):
@@ -199,17 +699,20 @@ class NonDiatonicChords(Metric):
     not part of the key of C major. Non-diatonic chords can introduce
     tension and color to a harmonic progression. This function rewards
     sequences that include these non-diatonic chords.
+
+    Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
     """
+    __slots__ = ("non_diatonic_chords",)
+
+    def __init__(self, chord_mappings):
+        self.non_diatonic_chords = chord_flags(
+            chord_mappings, ["C7", "D7", "E7", "A7", "Dm7b5", "Eº7", "Gmin7"]
+        )
+
     def calculate(self, chord_sequence):
-        score = 0
-        total_chords = len(chord_sequence)
-        non_diationic_chord_score = 1 / total_chords
-        non_diatonic_chords = {"C7", "D7", "E7", "A7", "Dm7b5", "Eº7", "Gmin7"}
-        for chord in chord_sequence:
-            if chord in non_diatonic_chords:
-                score += non_diationic_chord_score
-        return score
-        
+        return _non_diatonic_chords(chord_sequence, self.non_diatonic_chords)
+
 
 class ParallelFifths(Metric):
     """
@@ -220,17 +723,19 @@ class ParallelFifths(Metric):
     context. This class penalizes sequences with parallel fifths.
 
     Parameters:
+        chord_mappings (dict): Available chords mapped to their notes.
         chords_with_parallel_fifths (set): Chords with parallel fifths.
     """
-    def __init__(self, chords_with_parallel_fifths):
-        self.chords_with_parallel_fifths = chords_with_parallel_fifths
+    __slots__ = ("parallel_fifths",)
+
+    def __init__(self, chord_mappings, chords_with_parallel_fifths):
+        ids = chord_ids(chord_mappings)
+        self.parallel_fifths = np.zeros((len(ids), len(ids)), dtype=bool)
+        for chord_pair in chords_with_parallel_fifths:
+            chord, *other_chords = [ids[chord] for chord in chord_pair]
+            other_chord = other_chords[0] if other_chords else chord
+            self.parallel_fifths[chord, other_chord] = True
+            self.parallel_fifths[other_chord, chord] = True
 
     def calculate(self, chord_sequence):
-        score = 1
-        total_transitions = len(chord_sequence) - 1
-        parallel_fifth_penalty = - 1 / total_transitions
-        for i in range(total_transitions):
-            if frozenset([chord_sequence[i], chord_sequence[i + 1]]
-                         ) in self.chords_with_parallel_fifths:
-                score += parallel_fifth_penalty
-        return score
+        return _parallel_fifths(chord_sequence, self.parallel_fifths)